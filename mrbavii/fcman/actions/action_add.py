@@ -9,7 +9,9 @@ __license__ = "MIT License"
 __all__ = ["ACTIONS"]
 
 
+import collections
 import os
+import stat
 
 from .. import collection
 from .action_update import UpdateAction
@@ -47,19 +49,36 @@ class AddAction(UpdateAction):
         name = remaining[-1]
         path = os.path.join(node.path, name)
 
-        if os.path.islink(path):
+        # Determine the item type with a single lstat, which is also used
+        # for the size and time of a file
+        try:
+            stat_result = os.lstat(path)
+            mode = stat_result.st_mode
+        except OSError:
+            stat_result = None
+            mode = 0
+
+        if stat.S_ISLNK(mode):
             item = collection.Symlink(node, name, "")
             self.writer.stdout.status(item.prettypath, "ADDED")
             self.handle_symlink(item)
-        elif os.path.isfile(path):
+        elif stat.S_ISREG(mode):
             item = collection.File(node, name, 0, 0, "") # pylint: disable=redefined-variable-type
             self.writer.stdout.status(item.prettypath, "ADDED")
-            self.handle_file(item)
-        elif os.path.isdir(path):
+            self.handle_file(item, stat=stat_result)
+        elif stat.S_ISDIR(mode):
             item = collection.Directory(node, name)
             self.writer.stdout.status(item.prettypath, "ADDED")
             if self.options.recurse:
-                self.handle_directory(item)
+                self.start_jobs()
+                try:
+                    self.handle_directory(item)
+                except BaseException:
+                    # Don't wait for the queued work on an error or interrupt
+                    self.stop_jobs(cancel=True)
+                    raise
+                else:
+                    self.stop_jobs()
         else:
             return False
 
@@ -70,6 +89,7 @@ class AddAction(UpdateAction):
         """ Create each directory part (only if the given directory actually exists). """
 
         path = list(node.pathlist)
+        parts = collections.deque(parts)
         while True:
             # All nodes should be directories
             if not isinstance(node, collection.Directory):
@@ -90,7 +110,7 @@ class AddAction(UpdateAction):
                 return None
 
             # Check if the part is in the directory
-            name = parts.pop(0)
+            name = parts.popleft()
             path.append(name)
 
             if name in node.children:
@@ -0,0 +1,135 @@
+""" Batch action. """
+# pylint: disable=too-many-lines,missing-docstring,too-many-branches
+
+__author__ = "Brian Allen Vanderburg II"
+__copyright__ = "Copyright (C) 2013-2018 Brian Allen Vanderburg II"
+__license__ = "MIT License"
+
+
+__all__ = ["ACTIONS"]
+
+
+import argparse
+import os
+import shlex
+import sys
+
+from .base import ActionBase
+
+
+class BatchAction(ActionBase):
+    """ Run several actions on the collection, saving it only once. """
+
+    ACTION_NAME = "batch"
+    ACTION_DESC = "Run actions from a file, one per line, saving once at the end"
+
+    # Actions that can't be run from a batch
+    EXCLUDE = ("batch", "init")
+
+    def __init__(self, *args, **kwargs):
+        ActionBase.__init__(self, *args, **kwargs)
+        self._current = None
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super(BatchAction, cls).add_arguments(parser)
+        parser.add_argument("batchfile", nargs="?", default="-", help="File to read the actions from, or - for stdin")
+
+    def run(self):
+        parser = self._create_parser()
+
+        if self.options.batchfile == "-":
+            lines = sys.stdin.readlines()
+        else:
+            filename = os.path.join(self.program.iwd, self.options.batchfile)
+            try:
+                with open(filename, "rt") as handle:
+                    lines = handle.readlines()
+            except (IOError, OSError):
+                self.writer.stderr.status(self.options.batchfile, "LOAD ERROR")
+                return False
+
+        # Stop at the first action that fails.  Report-only actions such as
+        # verify also fail when they find a problem, so the changes made by
+        # the earlier actions are saved instead of being lost.
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            if self.verbose:
+                self.writer.stdout.status(line, "BATCH")
+
+            if not self._run_line(parser, line):
+                self.writer.stderr.status(line, "BATCH FAILED")
+                if self.program.collection.dirty:
+                    self.program.save_file()
+                    self.program.collection.dirty = False
+                return False
+
+        return True
+
+    def _create_parser(self):
+        """ Create the parser for the lines of the batch. """
+        from . import ACTIONS
+
+        parser = argparse.ArgumentParser(prog="fcman " + self.ACTION_NAME, exit_on_error=False)
+        subparsers = parser.add_subparsers()
+        for name in sorted(ACTIONS):
+            if name in self.EXCLUDE:
+                continue
+
+            action = ACTIONS[name]
+            subparser = subparsers.add_parser(name, help=action.ACTION_DESC, exit_on_error=False)
+            action.add_arguments(subparser)
+            subparser.set_defaults(action=action)
+
+        return parser
+
+    def _run_line(self, parser, line):
+        """ Parse and run a single action of the batch. """
+        # argparse writes help and errors to the streams directly, so keep
+        # them after the output of the earlier lines
+        self.writer.flush()
+
+        try:
+            parsed = parser.parse_args(shlex.split(line))
+        except ValueError:
+            # Unbalanced quotes from shlex
+            return False
+        except argparse.ArgumentError as e:
+            self.writer.stderr.writeln("{0}: error: {1}".format(parser.prog, e))
+            return False
+        except SystemExit as e:
+            # A help request exits with 0 after showing the help.  Other
+            # problems such as unrecognized arguments still exit, after
+            # argparse has reported them.
+            return e.code == 0
+
+        action = getattr(parsed, "action", None)
+        if action is None:
+            return False
+
+        # The action sees the program options with its own added
+        options = argparse.Namespace(**vars(self.program.options))
+        for (name, value) in vars(parsed).items():
+            setattr(options, name, value)
+        action.parse_arguments(options)
+
+        batch_options = self.program.options
+        self.program.options = options
+        try:
+            self._current = action(self.program)
+            return self._current.run()
+        finally:
+            self._current = None
+            self.program.options = batch_options
+
+    def handle_sigint(self):
+        """ Let the running action handle CTRL-C """
+        if self._current is not None:
+            return self._current.handle_sigint()
+        return None
+
+
+ACTIONS = [BatchAction]
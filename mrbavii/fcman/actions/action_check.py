@@ -9,6 +9,8 @@ __license__ = "MIT License"
 __all__ = ["ACTIONS"]
 
 
+import concurrent.futures
+import itertools
 import json
 import os
 
@@ -26,14 +28,21 @@ class CheckAction(ActionBase):
     def __init__(self, *args, **kwargs):
         ActionBase.__init__(self, *args, **kwargs)
         self._fullcheck = False
+        self._direct = False
         self._state = []
+        self._state_set = set() # For lookups, the list keeps the saved order
         self._autosave_read = 0
+        self._jobs = self.options.jobs
+        self._executor = None
+        self._checksums = {}
+        self._scans = {}
 
     @classmethod
     def add_arguments(cls, parser):
         super(CheckAction, cls).add_arguments(parser)
         parser.add_argument("-s", "--state", dest="state", default=None, help="Path to state file")
         parser.add_argument("--autosave-bytes", dest="autosave", default=1000000000, type=int, help="How many bytes before autosaving the state file")
+        parser.add_argument("-j", "--jobs", dest="jobs", default=1, type=int, help="Number of directory scans and checksums to run in parallel")
         parser.add_argument("path", nargs="?", default=".", help="Path to " + cls.ACTION_NAME)
 
     @classmethod
@@ -46,6 +55,12 @@ class CheckAction(ActionBase):
         elif options.autosave > 100000000000:
             options.autosave = 100000000000
 
+        # 0 uses one job per CPU
+        if options.jobs == 0:
+            options.jobs = os.cpu_count() or 1
+        elif options.jobs < 1:
+            options.jobs = 1
+
     def run(self):
         self._load_state()
 
@@ -60,25 +75,42 @@ class CheckAction(ActionBase):
             self.writer.stderr.status(path, "NONODE")
             return False
 
-        if isinstance(node, collection.Symlink):
-            result = self.handle_symlink(node)
-        elif isinstance(node, collection.File):
-            result = self.handle_file(node)
-        elif isinstance(node, collection.Directory):
-            result = self.handle_directory(node)
+        if self._jobs > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self._jobs)
+
+        try:
+            if isinstance(node, collection.Symlink):
+                result = self.handle_symlink(node)
+            elif isinstance(node, collection.File):
+                result = self.handle_file(node)
+            elif isinstance(node, collection.Directory):
+                result = self.handle_directory(node)
+            else:
+                result = False
+        except BaseException:
+            # Don't wait for the queued work on an error or interrupt
+            self._stop_jobs(cancel=True)
+            raise
         else:
-            result = False
+            self._stop_jobs()
 
         self._save_state()
         return result
 
-    def _missing_dir(self, node):
-        for i in sorted(node.children):
-            newnode = node.children[i]
+    def _stop_jobs(self, cancel=False):
+        """ Shut down the executor if one was created.  If cancel is set,
+            any scans and checksums not yet started are dropped instead of
+            waited for. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+            self._executor = None
+        self._checksums.clear()
+        self._scans.clear()
 
+    def _missing_dir(self, node):
+        # Report everything under the node but not the node itself
+        for newnode in itertools.islice(node.walk(), 1, None):
             self.writer.stdout.status(newnode.prettypath, 'MISSING')
-            if isinstance(newnode, collection.Directory):
-                self._missing_dir(newnode)
 
     def handle_symlink(self, node):
         target = os.readlink(node.path)
@@ -88,20 +120,24 @@ class CheckAction(ActionBase):
 
         return True
 
-    def handle_file(self, node):
+    def handle_file(self, node, entry=None):
         status = True
-        stat = os.stat(node.path)
+        if entry is not None:
+            stat = entry.stat(follow_symlinks=False)
+        else:
+            stat = os.stat(node.path)
 
         if abs(node.timestamp - stat.st_mtime) > util.TIMEDIFF:
             status = False
             self.writer.stdout.status(node.prettypath, 'TIMESTAMP')
 
-        if node.size != stat.st_size:
+        size_changed = node.size != stat.st_size
+        if size_changed:
             status = False
             self.writer.stdout.status(node.prettypath, 'SIZE')
 
         if self._fullcheck:
-            do_verify = node.prettypath not in self._state
+            do_verify = node.prettypath not in self._state_set
 
             if self.verbose:
                 if do_verify:
@@ -110,16 +146,27 @@ class CheckAction(ActionBase):
                     self.writer.stdout.status(node.prettypath, 'SKIPPED')
 
             if do_verify:
-                if node.checksum != node.calc_checksum():
+                # A file whose size changed can't have the same checksum, so
+                # it is not read
+                future = self._checksums.pop(node, None)
+                if size_changed:
+                    checksum = None
+                elif future is not None:
+                    checksum = future.result()
+                else:
+                    checksum = node.calc_checksum(self._direct)
+
+                if node.checksum != checksum:
                     status = False
                     self.writer.stdout.status(node.prettypath, 'CHECKSUM')
                 else:
                     # checksum verified add to state to avoid checking again
                     # if user wants to verify over multiple runs
                     self._state.append(node.prettypath)
+                    self._state_set.add(node.prettypath)
 
             # autosave if needed but don't count sizes of skipped files
-            if do_verify and self.options.state:
+            if do_verify and not size_changed and self.options.state:
                 self._autosave_read += stat.st_size
                 if self._autosave_read > self.options.autosave:
                     self._save_state()
@@ -133,13 +180,24 @@ class CheckAction(ActionBase):
             self.writer.stdout.status(node.prettypath, 'PROCESSING')
         status = True
 
+        # A single scan of the directory provides the type and stat
+        # information for all of the items in it
+        future = self._scans.pop(node, None)
+        if future is not None:
+            entries = future.result()
+        else:
+            entries = self.scan_directory(node)
+        items = self.merge_entries(node, entries)
+        ignored = node.ignore_set(i for (i, _, _) in items)
+
         # Check for missing
-        for i in sorted(node.children):
-            newnode = node.children[i]
+        for (i, newnode, entry) in items:
+            if newnode is None:
+                continue
 
-            if node.ignore(i):
+            if i in ignored:
                 self.writer.stdout.status(newnode.prettypath, 'SHOULDIGNORE')
-            if not newnode.exists():
+            if entry is None or not newnode.exists(entry):
                 self.writer.stdout.status(newnode.prettypath, 'MISSING')
                 status = False
 
@@ -149,14 +207,13 @@ class CheckAction(ActionBase):
 
 
         # Check for new items
-        for i in sorted(os.listdir(node.path)):
-            if not node.ignore(i) and not i in node.children:
+        for (i, child, entry) in items:
+            if child is None and not i in ignored:
                 self.writer.stdout.status(node.prettypath.rstrip("/") + "/" + i, 'NEW')
                 status = False
 
                 # Show new child items
-                path = node.path + os.sep + i
-                if os.path.isdir(path) and not os.path.islink(path) and self.options.recurse:
+                if entry.is_dir(follow_symlinks=False) and self.options.recurse:
                     newnode = collection.Directory(node, i)
 
                     orig = self._fullcheck
@@ -164,17 +221,27 @@ class CheckAction(ActionBase):
                     self.handle_directory(newnode)
                     self._fullcheck = orig
 
-                    del node.children[i]
+                    node.remove_child(i)
+
+        # Start scanning subdirectories and calculating checksums in the
+        # background if using jobs.  Results are still reported in order.
+        if self._executor is not None:
+            if self.options.recurse:
+                self._queue_scans(items)
+            if self._fullcheck:
+                self._queue_checksums(items)
 
         # Check children
-        for i in sorted(node.children):
-            child = node.children[i]
-            if child.exists():
+        for (_, child, entry) in items:
+            if child is None:
+                continue
+
+            if entry is not None and child.exists(entry):
                 if isinstance(child, collection.Symlink):
                     if not self.handle_symlink(child):
                         status = False
                 elif isinstance(child, collection.File):
-                    if not self.handle_file(child):
+                    if not self.handle_file(child, entry):
                         status = False
                 elif isinstance(child, collection.Directory) and self.options.recurse:
                     if not self.handle_directory(child):
@@ -182,11 +249,38 @@ class CheckAction(ActionBase):
                 else:
                     pass
 
+        # Discard any checksums or scans for children that were not handled
+        for (_, child, _) in items:
+            if child is not None:
+                self._checksums.pop(child, None)
+                self._scans.pop(child, None)
+
         return status
 
+    def _queue_scans(self, items):
+        """ Submit the scans of the existing subdirectories to the executor.
+            The entries are also stat'd there so those calls run in
+            parallel too. """
+        for (_, child, entry) in items:
+            if (isinstance(child, collection.Directory) and
+                    entry is not None and child.exists(entry)):
+                self._scans[child] = self._executor.submit(self.scan_and_stat, child)
+
+    def _queue_checksums(self, items):
+        """ Submit the checksum calculation of the directory's files to the
+            executor.  Results are still compared and reported in order.
+            Files whose size changed are not read. """
+        for (_, child, entry) in items:
+            if (isinstance(child, collection.File) and
+                    entry is not None and child.exists(entry) and
+                    entry.stat(follow_symlinks=False).st_size == child.size and
+                    child.prettypath not in self._state_set):
+                self._checksums[child] = self._executor.submit(child.calc_checksum, self._direct)
+
     def _load_state(self):
         """ Load the state file. """
         self._state = []
+        self._state_set = set()
 
         if self.options.state is None:
             return True
@@ -206,6 +300,8 @@ class CheckAction(ActionBase):
             if not isinstance(self._state, list):
                 return False
 
+            self._state_set = set(self._state)
+
         except (IOError, OSError, json.JSONDecodeError):
             return False
 
@@ -236,6 +332,12 @@ class VerifyAction(CheckAction):
     def __init__(self, *args, **kwargs):
         CheckAction.__init__(self, *args, **kwargs)
         self._fullcheck = True
+        self._direct = self.options.direct
+
+    @classmethod
+    def add_arguments(cls, parser):
+        super(VerifyAction, cls).add_arguments(parser)
+        parser.add_argument("--direct", dest="direct", default=False, action="store_true", help="Read files bypassing the page cache where supported")
 
 
 ACTIONS = [CheckAction, VerifyAction]
@@ -9,7 +9,11 @@ __license__ = "MIT License"
 __all__ = ["ACTIONS"]
 
 
-from .. import collection
+import bisect
+import collections
+import functools
+import itertools
+
 from .base import ActionBase
 
 
@@ -29,53 +33,73 @@ class CheckMetaAction(ActionBase):
     def _checkdeps(self):
         """ Check the dependencies. """
 
-        # First gather all known packages that are actaully attached to a node
-        packages = {}
-        self._checkdeps_walk_collect(self.program.collection.rootnode, packages)
+        # Gather all known packages that are actaully attached to a node and
+        # the dependencies of each node in a single walk
+        (packages, dependencies) = self._checkdeps_walk(self.program.collection.rootnode)
+        packages = self._checkdeps_index(packages)
 
         # Next check all dependencies from the nodes have a package to satisfy
-        return self._checkdeps_walk(self.program.collection.rootnode, packages)
+        status = True
+        for (node, depends) in dependencies:
+            if not self._checkdeps_find(depends, packages):
+                status = False
+                self.writer.stdout.status(node.prettypath, "DEPENDS", str(depends))
+
+        return status
 
-    def _checkdeps_walk_collect(self, node, packages):
-        for meta in node.meta.get("provides"):
-            name = meta.get("name")
-            if not name:
+    @staticmethod
+    def _checkdeps_walk(node):
+        """ Return the packages provided by and the dependencies of the node
+            and all nodes under it. """
+        packages = collections.defaultdict(set)
+        dependencies = []
+
+        for item in node.walk():
+            if not item.has_meta():
                 continue
 
-            version = meta.get("version")
+            for meta in item.meta.get("provides"):
+                name = meta.get("name")
+                if not name:
+                    continue
 
-            if not name in packages:
-                packages[name] = set()
-            packages[name].add(version)
+                packages[name].add(meta.get("version"))
 
+            for meta in item.meta.get("depends"):
 
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                self._checkdeps_walk_collect(node.children[child], packages)
+                name = meta.get("name")
+                if not name:
+                    continue
 
-    def _checkdeps_walk(self, node, packages):
-        status = True
+                minver = meta.get("minversion")
+                maxver = meta.get("maxversion")
+                dependencies.append((item, (name, minver, maxver)))
 
-        for meta in node.meta.get("depends"):
+        return (packages, dependencies)
 
-            name = meta.get("name")
-            if not name:
-                continue
+    @classmethod
+    def _checkdeps_index(cls, packages):
+        """ Index the provided versions of each package for range lookups.
+            Each package maps to whether any version is not a valid version,
+            and a sorted list of its parsed valid versions. """
+        index = {}
+        for (name, versions) in packages.items():
+            anyversion = False
+            parsed = []
+            for version in versions:
+                if version is None:
+                    continue # Can't compare to a package without a version
 
-            minver = meta.get("minversion")
-            maxver = meta.get("maxversion")
-            depends = (name, minver, maxver)
+                version = cls._checkdeps_parse(version)
+                if version is None:
+                    anyversion = True
+                else:
+                    parsed.append(version)
 
-            if not self._checkdeps_find(depends, packages):
-                status = False
-                self.writer.stdout.status(node.prettypath, "DEPENDS", str(depends))
+            parsed.sort()
+            index[name] = (anyversion, parsed)
 
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                if not self._checkdeps_walk(node.children[child], packages):
-                    status = False
-
-        return status
+        return index
 
     def _checkdeps_find(self, depends, packages):
         (name, minver, maxver) = depends
@@ -88,42 +112,53 @@ class CheckMetaAction(ActionBase):
         if minver is None and maxver is None:
             return True
 
-        for version in packages[name]:
-            if version is None:
-                continue # Can't compare to a package without a version
+        # A version that can't be parsed does not limit the range
+        (anyversion, versions) = packages[name]
+        if anyversion:
+            return True
 
-            if minver is not None and self._checkdeps_compare(version, minver) < 0:
-                continue
+        minver = self._checkdeps_parse(minver) if minver is not None else None
+        maxver = self._checkdeps_parse(maxver) if maxver is not None else None
 
-            if maxver is not None and self._checkdeps_compare(version, maxver) > 0:
-                continue
+        low = bisect.bisect_left(versions, minver) if minver is not None else 0
+        high = bisect.bisect_right(versions, maxver) if maxver is not None else len(versions)
 
-            # Found a version that is within the range
-            return True
+        # Found a version that is within the range
+        return high > low
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _checkdeps_parse(ver):
+        """ Parse a version into a tuple of numbers, or None if invalid.
+            Trailing zeros are removed so that missing elements compare as 0
+            with plain tuple ordering, ie "1.0" is the same as "1".  The same
+            few versions are parsed many times, so the results are cached. """
+        try:
+            parts = [int(part) for part in ver.split(".")]
+        except ValueError:
+            return None
+
+        while parts and parts[-1] == 0:
+            parts.pop()
+        return tuple(parts)
 
     @staticmethod
     def _checkdeps_compare(ver1, ver2):
         """ A simple version compare based only on numbers and periods. """
 
-        try:
-            ver1 = list(map(lambda ver: int(ver), ver1.split(".")))
-            ver2 = list(map(lambda ver: int(ver), ver2.split(".")))
-        except ValueError:
+        ver1 = CheckMetaAction._checkdeps_parse(ver1)
+        ver2 = CheckMetaAction._checkdeps_parse(ver2)
+        if ver1 is None or ver2 is None:
             return False
 
-        # pad to the same length
-        if len(ver1) < len(ver2):
-            ver1.extend([0] * (len(ver2) - len(ver1)))
-        elif len(ver2) < len(ver1):
-            ver2.extend([0] * (len(ver1) - len(ver2)))
-
-        # per element compare
-        if ver1 < ver2:
-            return -1
-        elif ver1 > ver2:
-            return 1
-        else:
-            return 0
+        # per element compare, treating missing elements as 0
+        for (part1, part2) in itertools.zip_longest(ver1, ver2, fillvalue=0):
+            if part1 < part2:
+                return -1
+            elif part1 > part2:
+                return 1
+
+        return 0
 
 
 ACTIONS = [CheckMetaAction]
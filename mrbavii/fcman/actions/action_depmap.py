@@ -11,7 +11,6 @@ __all__ = ["ACTIONS"]
 
 import os
 
-from .. import collection
 from .base import ActionBase
 from .action_checkmeta import CheckMetaAction as CMA
 
@@ -78,7 +77,8 @@ class DepMapAction(ActionBase):
 
         # First scan the nodes for useful information
         info = _Info()
-        self.__scan_nodes(self.program.collection.rootnode, info)
+        for node in self.program.collection.rootnode.walk():
+            self.__scan_node(node, info)
 
         # Once child nodes are scanned, we have our first link:
         # Node diagram node -> dependency diagram node
@@ -113,7 +113,7 @@ class DepMapAction(ActionBase):
         return self.__save_diag(diag)
 
 
-    def __scan_nodes(self, node, info):
+    def __scan_node(self, node, info):
         """ Determine if a node is of interest for the dependency map. """
 
         # For each interesting item, if interesting:
@@ -160,11 +160,6 @@ class DepMapAction(ActionBase):
             # since we already know the node -> dependency diag node lists, we can attach here
             info.node_diag_nodes[node] = _NodeDiagNode(node, dep_diag_nodes_ids)
 
-        # Handle children if needed
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                self.__scan_nodes(node.children[child], info)
-
     @staticmethod
     def __calc_labels(labels):
         """ Calculate the width/height needed for the labels. """
@@ -10,6 +10,7 @@ __all__ = ["ACTIONS"]
 
 
 import os
+import textwrap
 
 from .. import collection
 from .. import util
@@ -21,12 +22,36 @@ class ExportAction(ActionBase):
     ACTION_NAME = "export"
     ACTION_DESC = "Export information"
 
+    # The information written for each file, as a single line write
+    FILE_INFO = "File: {0}\nSize: {1}\n{2}: {3}\nModified: {4}"
+
+    # Checksum file names as used by the matching coreutils programs
+    SUMS_FILES = {
+        "md5": "md5sums.txt",
+        "sha256": "sha256sums.txt",
+        "blake2b": "b2sums.txt"
+    }
+
+    def __init__(self, *args, **kwargs):
+        ActionBase.__init__(self, *args, **kwargs)
+
+        # The handler for each node type, looked up by the exact type
+        self._handlers = {
+            collection.Symlink: self._handle_symlink,
+            collection.File: self._handle_file,
+            collection.Directory: self._handle_directory,
+            collection.RootDirectory: self._handle_directory
+        }
+
     def run(self):
         # Make directory if needed
         if not os.path.isdir(self.program.collection.exportdir):
             os.makedirs(self.program.collection.exportdir)
 
-        md5file = os.path.join(self.program.collection.exportdir, "md5sums.txt")
+        md5file = os.path.join(
+            self.program.collection.exportdir,
+            self.SUMS_FILES[self.program.collection.checksum]
+        )
         infofile = os.path.join(self.program.collection.exportdir, "info.txt")
 
         md5stream = util.TextFile(md5file)
@@ -36,7 +61,19 @@ class ExportAction(ActionBase):
 
         with md5stream:
             with infostream:
-                self._handle_directory(self.program.collection.rootnode, streams)
+                self._handle_tree(self.program.collection.rootnode, streams)
+
+    def _handle_tree(self, rootnode, streams):
+        # Each node after the first is separated from the previous one by
+        # a blank line
+        handlers = self._handlers
+        for node in rootnode.walk():
+            if node is not rootnode:
+                streams[1].writeln("")
+
+            handler = handlers.get(type(node))
+            if handler is not None:
+                handler(node, streams)
 
     def _handle_directory(self, node, streams):
         if self.verbose:
@@ -44,33 +81,21 @@ class ExportAction(ActionBase):
 
         streams[1].writeln("Directory: {0}".format(node.prettypath))
 
-        if node.meta:
+        if node.has_meta():
             self._dumpmeta(node, streams)
 
-        for child in sorted(node.children):
-            streams[1].writeln("")
-            childnode = node.children[child]
-            if isinstance(childnode, collection.Symlink):
-                self._handle_symlink(childnode, streams)
-            elif isinstance(childnode, collection.File):
-                self._handle_file(childnode, streams)
-            elif isinstance(childnode, collection.Directory):
-                self._handle_directory(childnode, streams)
-            else:
-                pass
-
     def _handle_symlink(self, node, streams):
         streams[1].writeln("Symlink: {0}".format(node.prettypath))
         streams[1].writeln("Target: {0}".format(node.target))
 
-        if node.meta:
+        if node.has_meta():
             self._dumpmeta(node, streams)
 
     def _handle_file(self, node, streams):
-        streams[1].writeln("File: {0}".format(node.prettypath))
-        streams[1].writeln("Size: {0}".format(node.size))
-        streams[1].writeln("MD5: {0}".format(node.checksum))
-        streams[1].writeln("Modified: {0}".format(node.timestamp))
+        streams[1].writeln(self.FILE_INFO.format(
+            node.prettypath, node.size, self.program.collection.checksum.upper(),
+            node.checksum, node.timestamp
+        ))
 
         if node.checksum:
             # skip the "/" at the beginning
@@ -78,7 +103,7 @@ class ExportAction(ActionBase):
         else:
             self.writer.stdout.status(node.prettypath, "MISSING CHECKSUM")
 
-        if node.meta:
+        if node.has_meta():
             self._dumpmeta(node, streams)
 
     @staticmethod
@@ -140,7 +165,6 @@ class ExportAction(ActionBase):
 
         descriptions = "\n".join(descriptions) # pylint: disable=redefined-variable-type
         if descriptions:
-            import textwrap
             lines = textwrap.wrap(descriptions, 75)
             streams[1].writeln("Description:\n  {0}".format(
                 "\n  ".join(lines)
@@ -9,7 +9,8 @@ __license__ = "MIT License"
 __all__ = ["ACTIONS"]
 
 
-from .. import collection
+import re
+
 from .base import ActionBase
 
 
@@ -19,6 +20,14 @@ class FindDescAction(ActionBase):
     ACTION_NAME = "finddesc"
     ACTION_DESC = "Find paths that match specific descriptions."
 
+    def __init__(self, *args, **kwargs):
+        ActionBase.__init__(self, *args, **kwargs)
+        self._finddescs = set(i.lower() for i in self.options.descs)
+
+        # Finds any of the descriptions in a single pass, used to skip the
+        # nodes that contain none of them
+        self._findany = re.compile("|".join(re.escape(i) for i in self._finddescs))
+
     @classmethod
     def add_arguments(cls, parser):
         super(FindDescAction, cls).add_arguments(parser)
@@ -46,37 +55,41 @@ class FindDescAction(ActionBase):
             self.writer.stderr.status(self.program.cwd, "BADPATH")
             return False
 
-        return self._handle_node(node)
+        status = False
+        for item in node.walk():
+            if self._handle_node(item):
+                status = True
+
+        return status
 
     def _handle_node(self, node):
         status = False
 
+        # Nodes without metadata have no descriptions to search
+        found = self._match_node(node) if node.has_meta() else None
+
+        if found:
+            status = True
+            self.writer.stdout.status(node.prettypath, "FINDDESC", ",".join(sorted(found)))
+
+        return status
+
+    def _match_node(self, node):
+        """ Return the set of searched descriptions found in the node's
+            descriptions if the node matches, or None. """
         alldescs = " ".join(
             meta.get("description", "").lower()
             for meta in node.meta.get("description")
         )
-        finddescs = set(i.lower() for i in self.options.descs)
-        found = set()
+        if not self._findany.search(alldescs):
+            return None
 
-        for desc in finddescs:
-            if desc in alldescs:
-                found.add(desc)
+        # Matches can overlap, so each description is still searched for
+        found = set(desc for desc in self._finddescs if desc in alldescs)
 
         if self.options.match_all:
-            matched = (found == finddescs)
-        else:
-            matched = len(found) > 0
-
-        if matched:
-            status = True
-            self.writer.stdout.status(node.prettypath, "FINDDESC", ",".join(sorted(found)))
-
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                if self._handle_node(node.children[child]):
-                    status = True
-
-        return status
+            return found if found == self._finddescs else None
+        return found if found else None
 
 
 ACTIONS = [FindDescAction]
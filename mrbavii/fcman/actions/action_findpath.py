@@ -12,7 +12,6 @@ __all__ = ["ACTIONS"]
 import fnmatch
 import re
 
-from .. import collection
 from .base import ActionBase
 
 
@@ -45,7 +44,12 @@ class FindPathAction(ActionBase):
             self.writer.stderr.status(self.program.cwd, "BADPATH")
             return False
 
-        return self._handle_node(node)
+        status = False
+        for item in node.walk():
+            if self._handle_node(item):
+                status = True
+
+        return status
 
     def _handle_node(self, node):
         status = False
@@ -68,11 +72,6 @@ class FindPathAction(ActionBase):
             status = True
             self.writer.stdout.status(node.prettypath, "FINDPATH")
 
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                if self._handle_node(node.children[child]):
-                    status = True
-
         return status
 
 
@@ -9,7 +9,6 @@ __license__ = "MIT License"
 __all__ = ["ACTIONS"]
 
 
-from .. import collection
 from .base import ActionBase
 
 
@@ -19,6 +18,10 @@ class FindTagAction(ActionBase):
     ACTION_NAME = "findtag"
     ACTION_DESC = "Find paths that match specific tags."
 
+    def __init__(self, *args, **kwargs):
+        ActionBase.__init__(self, *args, **kwargs)
+        self._findtags = set(tag.lower() for tag in self.options.tags)
+
     @classmethod
     def add_arguments(cls, parser):
         super(FindTagAction, cls).add_arguments(parser)
@@ -46,34 +49,36 @@ class FindTagAction(ActionBase):
             self.writer.stderr.status(self.program.cwd, "BADPATH")
             return False
 
-        return self._handle_node(node)
+        status = False
+        for item in node.walk():
+            if self._handle_node(item):
+                status = True
+
+        return status
 
     def _handle_node(self, node):
         status = False
 
-        alltags = set(
-            meta.get("tag", "").lower()
-            for meta in node.meta.get("tag")
-        )
-        findtags = set(tag.lower() for tag in self.options.tags)
+        # Nodes without metadata have no tags to search
+        found = self._match_node(node) if node.has_meta() else None
 
-        found = findtags.intersection(alltags)
-
-        if self.options.match_all:
-            matched = (found == findtags)
-        else:
-            matched = len(found) > 0
-
-        if matched:
+        if found:
             status = True
             self.writer.stdout.status(node.prettypath, "FINDTAG", ",".join(sorted(found)))
 
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                if self._handle_node(node.children[child]):
-                    status = True
-
         return status
 
+    def _match_node(self, node):
+        """ Return the set of searched tags found in the node's tags if the
+            node matches, or None. """
+        found = self._findtags.intersection(
+            meta.get("tag", "").lower()
+            for meta in node.meta.get("tag")
+        )
+
+        if self.options.match_all:
+            return found if found == self._findtags else None
+        return found if found else None
+
 
 ACTIONS = [FindTagAction]
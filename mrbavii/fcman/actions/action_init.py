@@ -21,6 +21,15 @@ class InitAction(ActionBase):
     ACTION_NAME = "init"
     ACTION_DESC = "Initialize a collection."
 
+    @classmethod
+    def add_arguments(cls, parser):
+        super(InitAction, cls).add_arguments(parser)
+        parser.add_argument(
+            "-c", "--checksum", dest="checksum", default="md5",
+            choices=collection.Collection.CHECKSUMS,
+            help="Checksum algorithm for the collection's files"
+        )
+
     def run(self):
         # This is a special action, collection is not loaded at this point
         # can't use self.program.file or self.program.collection
@@ -29,6 +38,7 @@ class InitAction(ActionBase):
         coll.set_exportdir(".")
         if self.options.root is not None:
             coll.autoroot = self.options.root
+        coll.checksum = self.options.checksum
 
         if os.path.exists(self.options.file):
             self.writer.stderr.status(self.options.file, "EXISTS")
@@ -10,8 +10,8 @@ __all__ = ["ACTIONS"]
 
 
 import os
+import textwrap
 
-from .. import collection
 from .base import ActionBase
 from .action_checkmeta import CheckMetaAction as CMA
 
@@ -80,10 +80,12 @@ class MetaReportAction(ActionBase):
         # format: {package: [(node, version),...]}
 
         # First scan the nodes for useful information
-        self._collect_meta(self.program.collection.rootnode)
+        for node in self.program.collection.rootnode.walk():
+            self._collect_meta(node)
 
         # Now report the meta information
-        self._report_meta(self.program.collection.rootnode)
+        for node in self.program.collection.rootnode.walk():
+            self._report_meta(node)
         
         # reportmeta simply reports the information, so missing dependencies
         # don't result in an error code like checkmeta does
@@ -104,15 +106,8 @@ class MetaReportAction(ActionBase):
             packages_list = self._packages.setdefault(name, [])
             packages_list.append((node, version))
 
-        # Handle children
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                self._collect_meta(node.children[child])
-
     def _report_meta(self, node):
         """ Report the meta. """
-        import textwrap
-
         # Description
         if "A" in self._report_type or "D" in self._report_type:
             desc = []
@@ -224,11 +219,6 @@ class MetaReportAction(ActionBase):
                     self.writer.stdout.statusline(node, "META", "OTHER")
                 self.writer.stdout.statusline(node, "META", "    " + repr(meta))
 
-        # Handle children
-        if isinstance(node, collection.Directory):
-            for child in sorted(node.children):
-                self._report_meta(node.children[child])
-        
 
 
 ACTIONS = [MetaReportAction]
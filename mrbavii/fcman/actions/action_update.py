@@ -9,6 +9,7 @@ __license__ = "MIT License"
 __all__ = ["UpdateAction"]
 
 
+import concurrent.futures
 import os
 
 from .. import collection
@@ -22,6 +23,12 @@ class UpdateAction(ActionBase):
     ACTION_NAME = "update"
     ACTION_DESC = "Update the collection"
 
+    def __init__(self, *args, **kwargs):
+        ActionBase.__init__(self, *args, **kwargs)
+        self._executor = None
+        self._checksums = {}
+        self._scans = {}
+
     @classmethod
     def add_arguments(cls, parser):
         super(UpdateAction, cls).add_arguments(parser)
@@ -29,8 +36,19 @@ class UpdateAction(ActionBase):
             "-f", "--force", dest="force", default=False,
             action="store_true", help="Always update the checksum."
         )
+        parser.add_argument("-j", "--jobs", dest="jobs", default=1, type=int, help="Number of directory scans and checksums to run in parallel")
         parser.add_argument("path", nargs="?", default=".", help="Path to " + cls.ACTION_NAME)
 
+    @classmethod
+    def parse_arguments(cls, options):
+        super(UpdateAction, cls).parse_arguments(options)
+
+        # 0 uses one job per CPU
+        if options.jobs == 0:
+            options.jobs = os.cpu_count() or 1
+        elif options.jobs < 1:
+            options.jobs = 1
+
     def run(self):
         path = self.normalize_path(self.options.path)
         if path is None:
@@ -48,74 +66,155 @@ class UpdateAction(ActionBase):
         elif isinstance(node, collection.File):
             self.handle_file(node)
         elif isinstance(node, collection.Directory):
-            self.handle_directory(node)
+            self.start_jobs()
+            try:
+                self.handle_directory(node)
+            except BaseException:
+                # Don't wait for the queued work on an error or interrupt
+                self.stop_jobs(cancel=True)
+                raise
+            else:
+                self.stop_jobs()
         else:
             return False
 
-        self.program.collection.dirty = True
+        # The collection is only marked dirty as changes are made so that an
+        # update with no changes does not rewrite the file
         return True
 
     def handle_symlink(self, node):
         target = os.readlink(node.path)
         if target != node.target:
             node.target = target
+            self.program.collection.dirty = True
             self.writer.stdout.status(node.prettypath, "SYMLINK")
 
-    def handle_file(self, node):
-        stat = os.stat(node.path)
-
-        if (self.options.force or
+    def start_jobs(self):
+        """ Create the executor used to scan directories and calculate
+            checksums in parallel. """
+        if self.options.jobs > 1:
+            self._executor = concurrent.futures.ThreadPoolExecutor(self.options.jobs)
+
+    def stop_jobs(self, cancel=False):
+        """ Shut down the executor if one was created.  If cancel is set,
+            any scans and checksums not yet started are dropped instead of
+            waited for. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+            self._executor = None
+        self._checksums.clear()
+        self._scans.clear()
+
+    def need_checksum(self, node, stat):
+        """ Test if a file's checksum needs to be calculated. """
+        return (self.options.force or
                 abs(node.timestamp - stat.st_mtime) > util.TIMEDIFF or
-                node.size != stat.st_size or node.checksum == ""):
+                node.size != stat.st_size or node.checksum == "")
+
+    def handle_file(self, node, entry=None, stat=None):
+        # The stat result may already be known from the directory entry or
+        # from the caller
+        if stat is None:
+            if entry is not None:
+                stat = entry.stat(follow_symlinks=False)
+            else:
+                stat = os.stat(node.path)
 
+        if self.need_checksum(node, stat):
             if self.verbose:
                 self.writer.stdout.status(node.prettypath, 'PROCESSING')
-            node.checksum = node.calc_checksum()
-            node.timestamp = int(stat.st_mtime)
-            node.size = stat.st_size
+
+            future = self._checksums.pop(node, None)
+            if future is not None:
+                checksum = future.result()
+            else:
+                checksum = node.calc_checksum()
+            timestamp = int(stat.st_mtime)
+            if (checksum, timestamp, stat.st_size) != (node.checksum, node.timestamp, node.size):
+                node.checksum = checksum
+                node.timestamp = timestamp
+                node.size = stat.st_size
+                self.program.collection.dirty = True
             self.writer.stdout.status(node.prettypath, 'CHECKSUM')
 
     def handle_directory(self, node):
         if self.verbose:
             self.writer.stdout.status(node.prettypath, 'PROCESSING')
 
+        # A single scan of the directory provides the type and stat
+        # information for all of the items in it
+        future = self._scans.pop(node, None)
+        if future is not None:
+            entries = future.result()
+        else:
+            entries = self.scan_directory(node)
+        items = self.merge_entries(node, entries)
+        ignored = node.ignore_set(i for (i, _, _) in items)
+
         # Check for missing items
-        for i in sorted(node.children):
-            child = node.children[i]
-            if node.ignore(i):
-                del node.children[i]
+        for (i, child, entry) in items:
+            if child is None:
+                continue
+
+            if i in ignored:
+                node.remove_child(i)
+                self.program.collection.dirty = True
                 self.writer.stdout.status(child.prettypath, 'IGNORED')
-            elif not child.exists():
-                del node.children[i]
+            elif entry is None or not child.exists(entry):
+                node.remove_child(i)
+                self.program.collection.dirty = True
                 self.writer.stdout.status(child.prettypath, 'DELETED')
 
-        # Add new items
-        for i in sorted(os.listdir(node.path)):
-            if not node.ignore(i) and not i in node.children:
-                path = node.path + os.sep + i
-
-                if os.path.islink(path):
+        # Add new items, including any removed above because the type changed
+        for (i, _, entry) in items:
+            if entry is not None and not i in node.children and not i in ignored:
+                if entry.is_symlink():
                     item = collection.Symlink(node, i, "")
-                elif os.path.isfile(path):
+                elif entry.is_file(follow_symlinks=False):
                     item = collection.File(node, i, 0, 0, "") # pylint: disable=redefined-variable-type
-                elif os.path.isdir(path):
+                elif entry.is_dir(follow_symlinks=False):
                     item = collection.Directory(node, i)
                 else:
                     continue # Unsupported item type, will be reported missing with check
 
+                self.program.collection.dirty = True
                 self.writer.stdout.status(item.prettypath, 'ADDED')
 
+        # Start scanning subdirectories and calculating checksums in the
+        # background if using jobs.  The results are still applied and
+        # reported in order below.
+        if self._executor is not None:
+            if self.options.recurse:
+                self._queue_scans(node)
+            self._queue_checksums(node, entries)
+
         # Update all item including newly added items
-        for i in sorted(node.children):
+        for i in node.sorted_names():
             child = node.children[i]
             if isinstance(child, collection.Symlink):
                 self.handle_symlink(child)
             elif isinstance(child, collection.File):
-                self.handle_file(child)
+                self.handle_file(child, entries.get(i))
             elif isinstance(child, collection.Directory) and self.options.recurse:
                 self.handle_directory(child)
             else:
                 pass
 
+    def _queue_scans(self, node):
+        """ Submit the scans of the directory's subdirectories to the
+            executor. """
+        for child in node.children.values():
+            if isinstance(child, collection.Directory):
+                self._scans[child] = self._executor.submit(self.scan_and_stat, child)
+
+    def _queue_checksums(self, node, entries):
+        """ Submit the checksum calculation of the directory's changed files
+            to the executor. """
+        for child in node.children.values():
+            if isinstance(child, collection.File) and child.name in entries:
+                stat = entries[child.name].stat(follow_symlinks=False)
+                if self.need_checksum(child, stat):
+                    self._checksums[child] = self._executor.submit(child.calc_checksum)
+
 
 ACTIONS = [UpdateAction]
@@ -9,8 +9,10 @@ __license__ = "MIT License"
 __all__ = ["ACTIONS"]
 
 
-from configparser import SafeConfigParser
+from configparser import ConfigParser
+import concurrent.futures
 import fnmatch
+import os
 import re
 
 from .. import collection
@@ -21,12 +23,19 @@ from .base import ActionBase
 class _MetaInfo(object):
     """ Represent metadata. """
 
+    __slots__ = (
+        "node", "users", "name", "pattern", "regexes", "has_version",
+        "autoname", "meta", "target"
+    )
+
     def __init__(self, node, options):
         """ Initial state of metadata. """
         self.node = node
         self.users = []
         self.name = None
         self.pattern = None
+        self.regexes = []
+        self.has_version = False
         self.autoname = []
         self.meta = collection.NodeMeta()
 
@@ -48,6 +57,9 @@ class _MetaInfo(object):
             # so the user can just do [*.txt] instead of [textfiles]\npattern=*.txt
             meta.pattern = name
 
+        meta.regexes = cls.compile_pattern(meta.pattern)
+        meta.has_version = "FILEVERSION" in meta.pattern
+
         if "autoname" in config:
             meta.autoname = set(util.splitval(config["autoname"]))
 
@@ -106,6 +118,28 @@ class _MetaInfo(object):
 
         return meta
 
+    @staticmethod
+    def compile_pattern(pattern):
+        """ Compile the comma separated patterns into a list of regex lists,
+            one regex per path component. """
+        result = []
+        for subpattern in pattern.split(","):
+            # Split by "/" and create regex for each path component
+            regex = []
+            for part in subpattern.split("/"):
+                if part in (".", ".."):
+                    regex.append(part) # just pass through the . and ..
+                else:
+                    regex_str = fnmatch.translate(part).replace(
+                        "FILEVERSION",
+                        "(?P<version>[0-9\\.]+)"
+                    )
+                    regex.append(re.compile(regex_str))
+
+            result.append(regex)
+
+        return result
+
     def apply_version(self, version):
         """ Apply a version to the autonames if specified. """
         if not self.autoname:
@@ -131,6 +165,21 @@ class UpdateMetaAction(ActionBase):
         ActionBase.__init__(self, *args, **kwargs)
         self._allmeta = []
 
+    @classmethod
+    def add_arguments(cls, parser):
+        super(UpdateMetaAction, cls).add_arguments(parser)
+        parser.add_argument("-j", "--jobs", dest="jobs", default=1, type=int, help="Number of meta files to read in parallel")
+
+    @classmethod
+    def parse_arguments(cls, options):
+        super(UpdateMetaAction, cls).parse_arguments(options)
+
+        # 0 uses one job per CPU
+        if options.jobs == 0:
+            options.jobs = os.cpu_count() or 1
+        elif options.jobs < 1:
+            options.jobs = 1
+
     def run(self):
         if not self.loadmeta(self.program.collection.rootnode):
             return False
@@ -149,43 +198,76 @@ class UpdateMetaAction(ActionBase):
 
     def loadmeta(self, node, force=False):
         status = True
-        for i in sorted(node.children):
-            child = node.children[i]
 
-            if i == "fcmeta.ini":
-                # Handle the special name "fcmeta.ini"
-                if isinstance(child, collection.Directory):
-                    # if directory is named fcmeta.ini, all INI files under
-                    # are loaded recursively
-                    if not self.loadmeta(child, True):
-                        status = False
-                else:
-                    # Just load the INI file
-                    if not self._loadmeta(child):
-                        status = False
+        # Find the meta files first so they can be read in parallel, then
+        # parse them in order
+        nodes = self._findmeta(node, force)
+        if self.options.jobs > 1 and len(nodes) > 1:
+            with concurrent.futures.ThreadPoolExecutor(self.options.jobs) as executor:
+                texts = list(executor.map(self._readmeta, nodes))
+        else:
+            texts = [self._readmeta(i) for i in nodes]
 
-            elif isinstance(child, collection.Directory):
-                # Not fcmeta.ini, process subdirs with same force setting
-                if not self.loadmeta(child, force):
-                    status = False
+        for (i, text) in zip(nodes, texts):
+            if not self._loadmeta(i, text):
+                status = False
+
+        return status
+
+    @staticmethod
+    def _findmeta(node, force=False):
+        """ Return the meta file nodes under a node in the order they are
+            loaded. """
+        result = []
+
+        # Walk with an explicit stack, in the same order as a recursive walk
+        # of the sorted children so the meta is applied in the same order
+        stack = [(node, force)]
+        while stack:
+            (node, force) = stack.pop()
+            name = node.name
+
+            if isinstance(node, collection.Directory):
+                # if directory is named fcmeta.ini, all INI files under
+                # are loaded recursively
+                force = force or name == "fcmeta.ini"
+                children = node.children
+                stack.extend(
+                    (children[i], force) for i in reversed(node.sorted_names())
+                )
+
+            elif name == "fcmeta.ini":
+                # Just load the INI file
+                result.append(node)
 
-            elif force and i.lower().endswith(".ini") and not i[0:1] in (".", "~"):
+            elif force and name.lower().endswith(".ini") and not name[0:1] in (".", "~"):
                 # If force is enabled the load all other INI files as well
-                if not self._loadmeta(child):
-                    status = False
+                result.append(node)
 
-        return status
+        return result
 
-    def _loadmeta(self, node):
+    @staticmethod
+    def _readmeta(node):
+        """ Read the text of a meta file, or return None if it can't be
+            read. """
+        try:
+            with open(node.path, "rt") as handle:
+                return handle.read()
+        except (IOError, OSError):
+            return None
+
+    def _loadmeta(self, node, text):
         if self.verbose:
             self.writer.stdout.status(node, 'LOADING')
 
-        config = SafeConfigParser()
-        read = config.read(node.path)
-        if not read:
+        if text is None:
             self.writer.stderr.status(node, 'LOAD ERROR')
             return False
 
+        # Values are used as written, there is no interpolation
+        config = ConfigParser(interpolation=None)
+        config.read_string(text, node.path)
+
         # Should at least have fcmeta options section
         if not config.has_section("fcman:fcmeta"):
             self.writer.stderr.status(node, 'NOTMETAINFO')
@@ -206,10 +288,9 @@ class UpdateMetaAction(ActionBase):
 
     def resetmeta(self, node):
         """ Clear the meta of a node and all child nodes. """
-        node.meta.clear()
-        if isinstance(node, collection.Directory):
-            for child in node.children:
-                self.resetmeta(node.children[child])
+        for child in node.walk(sort=False):
+            if child.has_meta():
+                child.meta.clear()
 
     def find_target(self, meta):
         """ Find the target the meta shold apply to. """
@@ -259,21 +340,8 @@ class UpdateMetaAction(ActionBase):
                 status = False
                 continue
 
-            patterns = meta.pattern.split(",")
-            for pattern in patterns:
-                # Split by "/" and create regex for each path component
-                regex = []
-                for part in pattern.split("/"):
-                    if part in (".", ".."):
-                        regex.append(part) # just pass through the . and ..
-                    else:
-                        regex_str = fnmatch.translate(part).replace(
-                            "FILEVERSION",
-                            "(?P<version>[0-9\\.]+)"
-                        )
-                        regex.append(re.compile(regex_str))
-
-                # Recursively apply meta using regex list
+            # Recursively apply meta using the compiled regex lists
+            for regex in meta.regexes:
                 self._applymeta_walk(parent, regex, meta)
 
         return status
@@ -286,11 +354,12 @@ class UpdateMetaAction(ActionBase):
 
         # Check for "." and ".."
         while regex and regex[0] in (".", ".."):
-            if regex.pop(0) == "..":
+            if regex[0] == "..":
                 if node.parent:
                     node = node.parent
                 else:
                     pass # TODO: ERROR
+            regex = regex[1:]
 
         # Check if the meta applies to this directory
         if not regex: # After any . and .., nothing left
@@ -298,36 +367,36 @@ class UpdateMetaAction(ActionBase):
             self.addmeta(node, meta, meta.meta)
             return
 
-        # Find matching child nodes
-        for name in sorted(node.children):
+        # Find matching child nodes.  Each name is matched once and the
+        # match is kept for the version.
+        matcher = regex[0].match
+        for (name, match) in ((i, matcher(i)) for i in node.sorted_names()):
+            if match is None:
+                continue
+
             child = node.children[name]
 
-            match = regex[0].match(name)
-            if match:
-                # Get the version if specified
-                try:
-                    _version = match.group("version")
-                except IndexError:
-                    # keep current version value
-                    pass
-
-                if len(regex) == 1:
-                    # last part of the regex so it applies to the found node
-                    meta.users.append(child)
-                    self.addmeta(child, meta, meta.meta)
-                    if _version is not None:
-                        self.addmeta(child, meta, meta.apply_version(_version))
-
-                elif len(regex) > 1 and isinstance(child, collection.Directory):
-                    # more nested regex to match, recurse if node is directory
-                    self._applymeta_walk(child, regex[1:], meta, _version)
+            # Get the version if specified, else keep the current value
+            if meta.has_version:
+                _version = match.groupdict().get("version", _version)
+
+            if len(regex) == 1:
+                # last part of the regex so it applies to the found node
+                meta.users.append(child)
+                self.addmeta(child, meta, meta.meta)
+                if _version is not None:
+                    self.addmeta(child, meta, meta.apply_version(_version))
+
+            elif len(regex) > 1 and isinstance(child, collection.Directory):
+                # more nested regex to match, recurse if node is directory
+                self._applymeta_walk(child, regex[1:], meta, _version)
 
     def addmeta(self, node, meta, values):
         """ Add the metadata to the node. """
 
         # Accumulate the new meta
         for entry in values.get():
-            node.meta.add(entry.get("type", ""), entry)
+            node.create_meta().add(entry.get("type", ""), entry)
 
         # Log
         if self.verbose:
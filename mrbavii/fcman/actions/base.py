@@ -7,6 +7,8 @@ __license__ = "MIT License"
 __all__ = ["ActionBase"]
 
 
+import os
+
 from .. import collection
 
 
@@ -48,26 +50,75 @@ class ActionBase(object):
         path = list(path)
         node = self.program.collection.rootnode
 
-        while len(path):
+        index = 0
+        while index < len(path):
             if not isinstance(node, collection.Directory):
                 break
 
-            for name in node.children:
-                if name == path[0]:
-                    node = node.children[name]
-                    path.pop(0)
-                    break # break for
-            else:
-                break # break while
+            child = node.children.get(path[index])
+            if child is None:
+                break
 
-        # len(path) == 0 means we found the node, else just the nearest parent
-        return (node, path)
+            node = child
+            index += 1
+
+        # empty remaining path means we found the node, else just the nearest parent
+        return (node, path[index:])
 
     def find_node(self, path):
         """ Find the exact node or return None. """
         (node, remaining_path) = self.find_nearest_node(path)
         return node if not remaining_path else None
 
+    @staticmethod
+    def scan_directory(node):
+        """ Scan the directory of a node and return a dictionary of the
+            os.DirEntry for each name. """
+        with os.scandir(node.path) as entries:
+            return {entry.name: entry for entry in entries}
+
+    @classmethod
+    def scan_and_stat(cls, node):
+        """ Scan a directory and cache the stat results of its entries.  This
+            is used when scanning in the background so the stat calls run in
+            parallel too. """
+        entries = cls.scan_directory(node)
+        for entry in entries.values():
+            try:
+                entry.stat(follow_symlinks=False)
+            except OSError:
+                pass # Reported when the entry is used
+        return entries
+
+    @staticmethod
+    def merge_entries(node, entries):
+        """ Merge the children of the node and the directory entries into a
+            single list of (name, child, entry) sorted by name.  The child or
+            entry is None if the name is only on one side. """
+        child_names = node.sorted_names()
+        fs_names = sorted(entries)
+
+        items = []
+        (i, j) = (0, 0)
+        while i < len(child_names) and j < len(fs_names):
+            if child_names[i] < fs_names[j]:
+                items.append((child_names[i], node.children[child_names[i]], None))
+                i += 1
+            elif child_names[i] > fs_names[j]:
+                items.append((fs_names[j], None, entries[fs_names[j]]))
+                j += 1
+            else:
+                items.append((child_names[i], node.children[child_names[i]], entries[fs_names[j]]))
+                i += 1
+                j += 1
+
+        for name in child_names[i:]:
+            items.append((name, node.children[name], None))
+        for name in fs_names[j:]:
+            items.append((name, None, entries[name]))
+
+        return items
+
     def handle_sigint(self):
         """ Handle CTRL-C """
         pass
@@ -9,18 +9,107 @@ __all__ = ["Node", "Symlink", "File", "Directory", "RootDirectory", "Collection"
 
 
 import os
+import bisect
+import collections
+import contextlib
+import errno
 import fnmatch
+import functools
 import hashlib
+import mmap
+import re
+import stat
+import sys
+import weakref
 
 try:
     from xml.etree import cElementTree as ET
 except ImportError:
     from xml.etree import ElementTree as ET
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+# Elements written by the incremental XML writer
+_Element = lxml_etree.Element if lxml_etree is not None else ET.Element
+
+# The same escaping ElementTree uses for attribute values and text
+_ATTRIB_ESCAPES = str.maketrans({
+    "&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;",
+    "\r": "&#13;", "\n": "&#10;", "\t": "&#09;"
+})
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+# Metadata entries already in use.  The same entries are often applied to
+# many nodes, so they share a single copy.  An entry is dropped once no node
+# uses it, so entries from earlier collections or cleared metadata don't
+# build up.
+_META_ENTRIES = weakref.WeakValueDictionary()
+
+
+def _lstat_mode(path):
+    """ Return the mode of the path without following symlinks, or 0 if it
+        does not exist. """
+    try:
+        return os.lstat(path).st_mode
+    except (OSError, ValueError):
+        return 0
+
+
+@functools.lru_cache(maxsize=256)
+def _ignore_regex(patterns):
+    """ Compile a tuple of ignore patterns into a single regular expression.
+        Most directories share the same few pattern sets, so these are
+        cached. """
+    return re.compile("|".join(
+        fnmatch.translate(os.path.normcase(pattern))
+        for pattern in patterns
+    ))
+
+
+class _XMLStreamWriter(object):
+    """ A minimal incremental XML writer with the parts of the interface of
+        lxml's xmlfile that are used to save a collection, for when lxml is
+        not installed. """
+
+    def __init__(self, handle):
+        self._handle = handle
+
+    def write_declaration(self):
+        """ Write the XML declaration. """
+        self._handle.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+
+    def write(self, data):
+        """ Write text or a complete element without children. """
+        if isinstance(data, str):
+            text = data.translate(_TEXT_ESCAPES)
+        else:
+            text = "<" + data.tag + self._attrib(data.attrib) + " />"
+        self._handle.write(text.encode("utf-8"))
+
+    @contextlib.contextmanager
+    def element(self, tag, attrib):
+        """ Write an element with the content written inside the context. """
+        self._handle.write(("<" + tag + self._attrib(attrib) + ">").encode("utf-8"))
+        yield
+        self._handle.write(("</" + tag + ">").encode("utf-8"))
+
+    @staticmethod
+    def _attrib(attrib):
+        """ Return the attributes of an element as text. """
+        return "".join(
+            " " + name + "=\"" + value.translate(_ATTRIB_ESCAPES) + "\""
+            for (name, value) in attrib.items()
+        )
+
 
 class NodeMeta(object):
     """ Represent the metadata for a node. """
 
+    __slots__ = ("_meta",)
+
     def __init__(self):
         self._meta = dict()
 
@@ -34,9 +123,18 @@ class NodeMeta(object):
         metadata = dict(metadata)
         metadata["type"] = metatype.strip()
 
-        # to prevent duplicates they are stored as a set of frozen sets
+        # to prevent duplicates they are stored as a set of frozen sets.  The
+        # shared copy is found by the sorted items, as a key that is the entry
+        # itself would keep it alive.
+        items = list(metadata.items())
+        key = tuple(sorted(items))
+        metaentry = _META_ENTRIES.get(key)
+        if metaentry is None:
+            metaentry = frozenset(items)
+            _META_ENTRIES[key] = metaentry
+
         metaset = self._meta.setdefault(metatype, set())
-        metaset.add(frozenset(metadata.items()))
+        metaset.add(metaentry)
 
     def get(self, metatypes=None, strip=True):
         """ Iterate over the metadata of a given type or all metadata.
@@ -67,58 +165,128 @@ class NodeMeta(object):
             self._meta.clear()
 
     def load(self, xml):
-        for child in xml:
-            if child.tag == "meta":
-                metatype = child.get("type", "").strip()
-                if metatype:
-                    self.add(metatype, child.items())
+        """ Load the metadata from a meta element. """
+        metatype = xml.get("type", "").strip()
+        if metatype:
+            self.add(metatype, xml.items())
 
-    def save(self, xml):
+    def save_stream(self, xf, level):
+        """ Write the metadata to an incremental XML writer. """
         for metaentry in self.get(strip=False):
-            ET.SubElement(xml, "meta", attrib=metaentry)
+            xf.write("\n" + " " * level)
+            xf.write(_Element("meta", attrib=metaentry))
+
+
+class _EmptyNodeMeta(NodeMeta):
+    """ The metadata read from nodes without any.  A single instance is
+        shared, so it can't be added to. """
+
+    __slots__ = ()
+
+    def add(self, metatype, metadata):
+        raise TypeError("metadata must be added through Node.create_meta()")
+
+
+_NO_META = _EmptyNodeMeta()
 
 
 class Node(object):
     """ A node represents a file, symlink, or directory in the collection. """
 
+    # Collections can have millions of nodes, so avoid a __dict__ per node
+    __slots__ = (
+        "name", "parent", "collection",
+        "_meta", "_pathcache", "_prettypathcache"
+    )
+
     def __init__(self, parent, name):
         """ Initialize the node with the parent and name. """
-        self.name = name
+        # Names such as "README" repeat throughout large collections, so
+        # share a single string for each distinct name
+        self.name = sys.intern(name) if name is not None else None
         self.parent = parent
-        self.meta = NodeMeta()
+        self._meta = None # Created when first used, most nodes have none
+        self._pathcache = None # (root, path)
+        self._prettypathcache = None
 
         if parent is not None:
-            parent.children[name] = self
+            parent.add_child(self)
             self.collection = parent.collection
-            self.pathlist = parent.pathlist + (name,)
         else:
             assert isinstance(self, RootDirectory)
             assert name is None
-            self.pathlist = ()
+
+    @property
+    def meta(self):
+        """ Return the metadata of the node for reading.  Nodes without any
+            share an empty metadata object instead of creating one. """
+        if self._meta is None:
+            return _NO_META
+
+        return self._meta
+
+    def create_meta(self):
+        """ Return the metadata of the node for changing, creating it if
+            needed. """
+        if self._meta is None:
+            self._meta = NodeMeta()
+
+        return self._meta
+
+    def has_meta(self):
+        """ Test if the node has any metadata without creating it. """
+        return bool(self._meta)
+
+    @property
+    def pathlist(self):
+        """ Return the names of the nodes from the root to this node.  This
+            is not stored, as a tuple per node adds up in large collections. """
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+
+        names.reverse()
+        return tuple(names)
 
     @property
     def path(self):
         """ Return the filesystem path of the node. """
-        return os.path.join(
-            self.collection.root,
-            *self.pathlist
-        )
+        # The root is part of the cache as it can be set after loading.  The
+        # path is built from the parent's cached path.
+        root = self.collection.root
+        if self._pathcache is None or self._pathcache[0] != root:
+            if self.parent is None:
+                path = root
+            else:
+                path = os.path.join(self.parent.path, self.name)
+            self._pathcache = (root, path)
+
+        return self._pathcache[1]
 
     @property
     def prettypath(self):
         """ Return the path of the node under root. Each segment is
             separated by a forward slash. """
-        return "/" + "/".join(self.pathlist)
+        if self._prettypathcache is None:
+            if self.parent is None:
+                self._prettypathcache = "/"
+            else:
+                parentpath = self.parent.prettypath
+                if parentpath == "/":
+                    parentpath = ""
+                self._prettypathcache = parentpath + "/" + self.name
+
+        return self._prettypathcache
 
     # Load and save
     @classmethod
     def load(cls, parent, xml):
-        """ Load the node from the XML and load metadata from that. """
-        # pylint: disable=protected-access
-        node = cls._load(parent, xml)
-        node.meta.load(xml)
-
-        return node
+        """ Load the node from the attributes of the XML element.  Child
+            elements such as metadata are loaded by Collection.load as they
+            are parsed. """
+        return cls._load(parent, xml)
 
     @classmethod
     def _load(cls, parent, xml):
@@ -126,18 +294,36 @@ class Node(object):
             parent node. """
         raise NotImplementedError
 
-    def save(self, xml):
-        """ Save the node and metadata to the XML element. """
-        self.meta.save(xml)
-        return self._save(xml)
-
-    def _save(self, xml):
-        """ Save information to the XML element. """
+    def save_stream(self, xf, tag, level):
+        """ Write the node and metadata to an incremental XML writer
+            without building the element tree in memory. """
+        xf.write("\n" + " " * level)
+        if not self.has_meta() and not self._has_content():
+            xf.write(_Element(tag, self._attrib()))
+            return
+
+        with xf.element(tag, self._attrib()):
+            if self.has_meta():
+                self._meta.save_stream(xf, level + 1)
+            self._save_stream(xf, level + 1)
+            xf.write("\n" + " " * level)
+
+    def _attrib(self):
+        """ Return the XML attributes of the node. """
         raise NotImplementedError
 
+    def _has_content(self):
+        """ Test if the node has additional information to save. """
+        return False
+
+    def _save_stream(self, xf, level):
+        """ Write any additional information to the XML writer. """
+        pass
+
     # Access/manupulate node
-    def exists(self):
-        """ Test if the filesystem path exists. """
+    def exists(self, entry=None):
+        """ Test if the filesystem path exists.  If entry is specified, it is
+            the os.DirEntry of the path from an earlier directory scan. """
         raise NotImplementedError
 
     def reparent(self, parent):
@@ -166,12 +352,12 @@ class Node(object):
 
         # Remove from our parent and insert into new parent
         assert self.parent.children[self.name] is self
-        self.parent.children.pop(self.name)
+        self.parent.remove_child(self.name)
 
         # Add to new parent and update path
         self.parent = parent
-        parent.children[self.name] = self
-        self._update_pathlist()
+        parent.add_child(self)
+        self._reset_paths()
 
         return True
 
@@ -192,12 +378,12 @@ class Node(object):
 
         # Remove the current name
         assert self.parent.children[self.name] is self
-        self.parent.children.pop(self.name)
+        self.parent.remove_child(self.name)
 
         # Set and insert the new name and update the path
-        self.name = newname
-        self.parent.children[newname] = self
-        self._update_pathlist()
+        self.name = sys.intern(newname)
+        self.parent.add_child(self)
+        self._reset_paths()
 
         return True
 
@@ -210,19 +396,55 @@ class Node(object):
 
         # Remove the node from the parent
         assert self.parent.children[self.name] is self
-        self.parent.children.pop(self.name)
+        self.parent.remove_child(self.name)
         self.parent = None
 
         return True
 
-    def _update_pathlist(self):
-        """ Update the path list when node is renamed or moved. """
-        self.pathlist = self.parent.pathlist + (self.name,)
+    def walk(self, sort=True):
+        """ Iterate over this node and all nodes below it, depth first with
+            the children of each directory in sorted order unless sort is
+            False.  This uses an explicit stack so deep trees do not hit the
+            recursion limit. """
+        # pylint: disable=protected-access
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            yield node
+
+            if isinstance(node, Directory):
+                children = node.children
+                if sort:
+                    # The names are used right away, so no copy is needed
+                    stack.extend(children[name] for name in reversed(node._sorted_names))
+                else:
+                    stack.extend(children.values())
+
+    def _reset_paths(self):
+        """ Reset the cached paths of the node and any child nodes when the
+            node is renamed or moved. """
+        # pylint: disable=protected-access
+        queue = collections.deque([self])
+        while queue:
+            node = queue.popleft()
+
+            # A child's paths are only cached after its parent's are, so
+            # nothing below a node without cached paths needs resetting
+            if node is not self and node._pathcache is None and node._prettypathcache is None:
+                continue
+
+            node._pathcache = None
+            node._prettypathcache = None
+
+            if isinstance(node, Directory):
+                queue.extend(node.children.values())
 
 
 class Symlink(Node):
     """ A symbolic link node. """
 
+    __slots__ = ("target",)
+
     def __init__(self, parent, name, target):
         """ Initialize the symlink node. """
         Node.__init__(self, parent, name)
@@ -236,19 +458,25 @@ class Symlink(Node):
 
         return Symlink(parent, name, target)
 
-    def _save(self, xml):
-        """ Save the symlink node to XML. """
-        xml.set('name', self.name)
-        xml.set('target', self.target)
+    def _attrib(self):
+        """ Return the XML attributes of the symlink node. """
+        return {'name': self.name, 'target': self.target}
 
-    def exists(self):
+    def exists(self, entry=None):
         """ Test if the symlink exists. """
-        return os.path.islink(self.path)
+        if entry is not None:
+            return entry.is_symlink()
+        return stat.S_ISLNK(_lstat_mode(self.path))
 
 
 class File(Node):
     """ A file node """
 
+    __slots__ = ("size", "timestamp", "checksum")
+
+    # Size of each read or update when hashing
+    BLOCK_SIZE = 4096000
+
     def __init__(self, parent, name, size, timestamp, checksum):
         """ Initialize the file node. """
         Node.__init__(self, parent, name)
@@ -267,37 +495,114 @@ class File(Node):
 
         return File(parent, name, int(size), int(timestamp), checksum)
 
-    def _save(self, xml):
-        """ Save the file node to XML. """
-        xml.set('name', self.name)
-        xml.set('size', str(self.size))
-        xml.set('timestamp', str(self.timestamp))
-        xml.set('checksum', self.checksum)
+    def _attrib(self):
+        """ Return the XML attributes of the file node. """
+        return {
+            'name': self.name,
+            'size': str(self.size),
+            'timestamp': str(self.timestamp),
+            'checksum': self.checksum
+        }
+
+    def calc_checksum(self, direct=False):
+        """ Calculate the checksum and return the result.  If direct is set
+            the file is read with O_DIRECT where supported, bypassing the
+            page cache. """
+        hasher = hashlib.new(self.collection.checksum)
+
+        if direct and self._update_direct(hasher):
+            return hasher.hexdigest()
+
+        # The file is read in large blocks into our own buffer, so it is
+        # opened unbuffered
+        with open(self.path, 'rb', buffering=0) as handle:
+            filesize = os.fstat(handle.fileno()).st_size
+
+            # Files of more than one block are read once from start to end,
+            # so ask for readahead and don't let them push everything else
+            # out of the page cache afterwards
+            advise = filesize > self.BLOCK_SIZE and hasattr(os, "posix_fadvise")
+            if advise:
+                os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+            # The file is not memory mapped, as a file truncated while
+            # mapped raises SIGBUS instead of giving an error
+            self._update_read(handle, hasher, filesize)
+
+            if advise:
+                os.posix_fadvise(handle.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
 
-    def calc_checksum(self):
-        """ Calculate the checksum and return the result. """
-        hasher = hashlib.md5()
+        return hasher.hexdigest()
 
-        with open(self.path, 'rb') as handle:
-            data = handle.read(4096000)
-            while len(data):
-                hasher.update(data)
-                data = handle.read(4096000)
+    def _update_read(self, handle, hasher, filesize):
+        """ Update the hasher by reading the file. """
+        # Read into a single reused buffer instead of allocating a new
+        # bytes object for each block.  Small files only get a buffer
+        # as large as they are.
+        buf = bytearray(max(1, min(filesize, self.BLOCK_SIZE)))
+        view = memoryview(buf)
+        try:
+            size = handle.readinto(buf)
+            while size:
+                hasher.update(view[:size])
+                size = handle.readinto(buf)
+        finally:
+            view.release()
+
+    def _update_direct(self, hasher):
+        """ Update the hasher by reading the file with O_DIRECT.  Returns
+            False without updating the hasher if the platform or filesystem
+            does not support it. """
+        if not hasattr(os, "O_DIRECT"):
+            return False
 
-        return hasher.hexdigest()
+        try:
+            fd = os.open(self.path, os.O_RDONLY | os.O_DIRECT)
+        except OSError as e:
+            if e.errno == errno.EINVAL:
+                return False
+            raise
+
+        try:
+            # O_DIRECT needs an aligned buffer, which an anonymous memory
+            # map is.  BLOCK_SIZE is a multiple of the page size.
+            with mmap.mmap(-1, self.BLOCK_SIZE) as buf:
+                view = memoryview(buf)
+                try:
+                    try:
+                        size = os.readv(fd, [buf])
+                    except OSError as e:
+                        if e.errno == errno.EINVAL:
+                            return False
+                        raise
+
+                    while size:
+                        hasher.update(view[:size])
+                        size = os.readv(fd, [buf])
+                finally:
+                    view.release()
+        finally:
+            os.close(fd)
 
-    def exists(self):
+        return True
+
+    def exists(self, entry=None):
         """ Test if the file exists. """
-        return os.path.isfile(self.path) and not os.path.islink(self.path)
+        if entry is not None:
+            return entry.is_file(follow_symlinks=False)
+        return stat.S_ISREG(_lstat_mode(self.path))
 
 
 class Directory(Node):
     """ A directory node """
 
+    __slots__ = ("children", "_sorted_names", "ignore_patterns")
+
     def __init__(self, parent, name):
         """ Initialize the directory node. """
         Node.__init__(self, parent, name)
         self.children = {}
+        self._sorted_names = [] # Kept sorted as children are added/removed
         self.ignore_patterns = []
 
     @classmethod
@@ -315,65 +620,92 @@ class Directory(Node):
             if pattern:
                 dir.ignore_patterns.append(pattern)
 
-        for child in xml:
-            if child.tag == 'symlink':
-                Symlink.load(dir, child)
-            elif child.tag == 'directory':
-                Directory.load(dir, child)
-            elif child.tag == 'file':
-                File.load(dir, child)
-
         return dir
 
-    def _save(self, xml):
-        """ Save the directory node to XML. """
+    def _attrib(self):
+        """ Return the XML attributes of the directory node. """
+        attrib = {}
         if not isinstance(self, RootDirectory):
-            xml.set('name', self.name)
+            attrib['name'] = self.name
 
         if self.ignore_patterns:
-            xml.set("ignore", ",".join(self.ignore_patterns))
+            attrib["ignore"] = ",".join(self.ignore_patterns)
+
+        return attrib
+
+    def _has_content(self):
+        """ Test if the directory has child nodes to save. """
+        return bool(self.children)
 
-        for name in sorted(self.children):
+    def _save_stream(self, xf, level):
+        """ Write the child nodes to the XML writer. """
+        for name in self._sorted_names:
             child = self.children[name]
+            child.save_stream(xf, self._child_tag(child), level)
+
+    @staticmethod
+    def _child_tag(child):
+        """ Return the XML tag used for a child node. """
+        if isinstance(child, Symlink):
+            tag = 'symlink'
+        elif isinstance(child, File):
+            tag = 'file'
+        elif isinstance(child, Directory):
+            tag = 'directory'
+        else:
+            tag = None
 
-            if isinstance(child, Symlink):
-                tag = 'symlink'
-            elif isinstance(child, File):
-                tag = 'file'
-            elif isinstance(child, Directory):
-                tag = 'directory'
-            else:
-                pass
+        return tag
+
+    def add_child(self, node):
+        """ Add a child node under its name, replacing any existing child
+            with the same name. """
+        if node.name not in self.children:
+            bisect.insort(self._sorted_names, node.name)
+        self.children[node.name] = node
+
+    def remove_child(self, name):
+        """ Remove and return the child node with the given name. """
+        node = self.children.pop(name)
+        del self._sorted_names[bisect.bisect_left(self._sorted_names, name)]
+        return node
 
-            element = ET.SubElement(xml, tag)
-            child.save(element)
+    def sorted_names(self):
+        """ Return a list of the child names in sorted order.  The list is a
+            copy so children may be removed while iterating over it. """
+        return list(self._sorted_names)
 
     def ignore(self, name):
         """ Ignore certain files under the directory. """
-        for i in self.ignore_patterns:
-            if fnmatch.fnmatch(name, i):
-                return True
+        return bool(self.ignore_set((name,)))
 
-        for meta in self.meta.get("ignore"):
-            if fnmatch.fnmatch(name, meta.get("pattern", "")):
-                return True
+    def ignore_set(self, names):
+        """ Return the set of the given names that are ignored.  This only
+            gathers the directory's patterns once for all of the names. """
+        patterns = self.ignore_patterns
+        if self.has_meta():
+            patterns = patterns + [
+                meta.get("pattern", "") for meta in self._meta.get("ignore")
+            ]
 
-        return False
+        if not patterns:
+            return set()
 
-    def exists(self):
-        """ Test if the directory exists. """
-        return os.path.isdir(self.path) and not os.path.islink(self.path)
+        match = _ignore_regex(tuple(patterns)).match
+        return set(name for name in names if match(os.path.normcase(name)))
 
-    def _update_pathlist(self):
-        """ Update the path list recursively for children. """
-        Node._update_pathlist(self)
-        for name in self.children:
-            self.children[name]._update_pathlist() # pylint: disable=protected-access
+    def exists(self, entry=None):
+        """ Test if the directory exists. """
+        if entry is not None:
+            return entry.is_dir(follow_symlinks=False)
+        return stat.S_ISDIR(_lstat_mode(self.path))
 
 
 class RootDirectory(Directory):
     """ The root directory. """
 
+    __slots__ = ()
+
     def __init__(self, collection):
         """ Initialize the root directory. """
         self.collection = collection
@@ -383,6 +715,19 @@ class RootDirectory(Directory):
 class Collection(object):
     """ This is the collection object. """
 
+    # Supported checksum algorithms, collections without one use md5
+    CHECKSUMS = ("md5", "sha256", "blake2b")
+
+    # Size of the write buffer used when saving
+    SAVE_BUFFER = 1024 * 1024
+
+    # Node class for each child element of a directory
+    _NODE_TAGS = {
+        "symlink": Symlink,
+        "directory": Directory,
+        "file": File
+    }
+
     def __init__(self):
         """ Initialize the collection with the root of the collection. """
 
@@ -391,6 +736,7 @@ class Collection(object):
         self.autoroot = "."
         self.exportdir = None
         self.autoexportdir = "."
+        self.checksum = "md5"
         self.dirty = False # This flag is set externally by actions to indicate to save
 
     def set_root(self, root):
@@ -438,53 +784,96 @@ class Collection(object):
         """ Function to load a file and return the collection object. """
         coll = Collection()
 
-        tree = ET.parse(filename)
-        root_xml_node = tree.getroot()
-        if not root_xml_node.tag == 'collection':
-            return None
+        # Parse incrementally, creating nodes as their elements start and
+        # discarding each element once it ends so the whole document is
+        # never held in memory.
+        stack = [] # (element, node) for each open element
+        for (event, element) in ET.iterparse(filename, events=("start", "end")):
+            if event == "end":
+                stack.pop()
+                element.clear()
+                if stack:
+                    del stack[-1][0][-1]
+                continue
 
-        coll.autoroot = root_xml_node.get("root", ".").replace("/", os.sep)
-        coll.autoexportdir = root_xml_node.get("export", ".").replace("/", os.sep)
+            if not stack:
+                if not element.tag == 'collection':
+                    return None
 
-        # Load the root node
-        coll.rootnode = RootDirectory.load(coll, root_xml_node)
+                coll.autoroot = element.get("root", ".").replace("/", os.sep)
+                coll.autoexportdir = element.get("export", ".").replace("/", os.sep)
+                coll.checksum = element.get("checksum", "md5")
+                if not coll.checksum in cls.CHECKSUMS:
+                    return None
+
+                # Load the root node
+                coll.rootnode = RootDirectory.load(coll, element)
+                stack.append((element, coll.rootnode))
+                continue
+
+            parent = stack[-1][1]
+            node = None
+
+            if parent is None:
+                pass # Inside an unknown element
+            elif element.tag == 'meta':
+                parent.create_meta().load(element)
+            elif isinstance(parent, Directory):
+                nodetype = cls._NODE_TAGS.get(element.tag)
+                if nodetype is not None:
+                    node = nodetype.load(parent, element)
+
+            stack.append((element, node))
 
         return coll
 
-    def save(self, filename):
-        """ Save the collection to XML. """
-        root_xml_node = ET.Element('collection')
+    def _attrib(self):
+        """ Return the XML attributes of the collection. """
+        attrib = {}
         if self.autoroot:
-            root_xml_node.set("root", self.autoroot.replace(os.sep, "/"))
+            attrib["root"] = self.autoroot.replace(os.sep, "/")
         else:
-            root_xml_node.set("root", ".")
+            attrib["root"] = "."
 
         if self.autoexportdir:
-            root_xml_node.set("export", self.autoexportdir.replace(os.sep, "/"))
+            attrib["export"] = self.autoexportdir.replace(os.sep, "/")
         else:
-            root_xml_node.set("export", ".")
+            attrib["export"] = "."
 
-        self.rootnode.save(root_xml_node)
-        tree = ET.ElementTree(root_xml_node)
+        if self.checksum != "md5":
+            attrib["checksum"] = self.checksum
 
-        # Prettify the output ourselves, similar to some code at stack overflow
-        queue = [(0, root_xml_node)]
-        while queue:
-            (level, element) = queue.pop(0)
-            children = [(level + 1, child) for child in list(element)]
-            if children:
-                # Child open
-                element.text = "\n" + " " * (level + 1)
-            if queue and queue[0][0] == level:
-                # sibling open
-                element.tail = "\n" + " " * queue[0][0]
-            else:
-                # no siblings at same level, parent close
-                element.tail = "\n" + " " * (level - 1)
+        return attrib
 
-            queue[0:0] = children
+    def save(self, filename):
+        """ Save the collection to XML.  Elements are written as the nodes
+            are visited, so the XML tree is never built in memory.  lxml's
+            incremental writer is used if it is available. """
+        # pylint: disable=protected-access
+        attrib = self._attrib()
+        attrib.update(self.rootnode._attrib())
+
+        # Many small pieces are written, so a large buffer keeps the number
+        # of write calls down
+        with open(filename, 'wb', buffering=self.SAVE_BUFFER) as handle:
+            if lxml_etree is not None:
+                writer = lxml_etree.xmlfile(handle, encoding='utf-8')
+            else:
+                writer = contextlib.nullcontext(_XMLStreamWriter(handle))
 
-        # We don't need to use codecs here as ElementTree actually does the
-        # encoding based on the enconding= parameter, unlike xml.dom.minidom
-        tree.write(filename, encoding='utf-8', xml_declaration=True,
-                   method='xml')
+            with writer as xf:
+                xf.write_declaration()
+                if not self.rootnode.has_meta() and not self.rootnode._has_content():
+                    xf.write(_Element('collection', attrib))
+                else:
+                    with xf.element('collection', attrib):
+                        if self.rootnode.has_meta():
+                            self.rootnode.meta.save_stream(xf, 1)
+                        self.rootnode._save_stream(xf, 1)
+                        xf.write("\n")
+            handle.write(b"\n")
+
+            # Make sure the data is on disk before the caller renames the
+            # file over the previous one
+            handle.flush()
+            os.fsync(handle.fileno())
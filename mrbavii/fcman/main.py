@@ -17,8 +17,10 @@ __license__ = "MIT"
 
 import argparse
 import os
+import shutil
 import signal
 import sys
+import tempfile
 
 from . import util
 from . import actions
@@ -38,16 +40,18 @@ signal.signal(signal.SIGINT, sigint_print_and_exit)
 
 
 class VerboseChecker(object):
-    """ A small class whose boolean value depends on verbose or a signal. """
+    """ A small class whose boolean value depends on verbose or a signal.
+        The output requested by a signal is flushed right away, so it shows
+        even when the output is buffered. """
 
-    def __init__(self, verbose):
+    def __init__(self, verbose, writer):
         self._verbose = verbose
+        self._writer = writer
         self._signalled = False
 
-        try:
+        # SIGUSR1 does not exist on all platforms, such as Windows
+        if hasattr(signal, "SIGUSR1"):
             signal.signal(signal.SIGUSR1, self._signal)
-        except ImportError:
-            pass
 
     def _signal(self, sig, stack):
         # pylint: disable=unused-argument
@@ -55,7 +59,9 @@ class VerboseChecker(object):
 
     def __bool__(self):
         result = self._verbose or self._signalled
-        self._signalled = False
+        if self._signalled:
+            self._signalled = False
+            self._writer.stdout.flush_next()
         return result
 
     __nonzero__ = __bool__
@@ -108,8 +114,8 @@ class Program(object):
         self.options = options = parser.parse_args()
 
         # Handle some objects
-        self.verbose = verbose = VerboseChecker(options.verbose)
         self.writer = writer = util.StdStreamWriter()
+        self.verbose = verbose = VerboseChecker(options.verbose, writer)
 
         # Handle current directory
         self.iwd = os.getcwd()
@@ -147,8 +153,7 @@ class Program(object):
             signal.signal(signal.SIGINT, orig_handler)
 
         if self.collection and self.collection.dirty:
-            self.save_backup()
-            self.collection.save(self.file)
+            self.save_file()
 
         return 0
 
@@ -166,6 +171,9 @@ class Program(object):
             writer.stdout.status(self.file, "COLLECTION")
 
         self.collection = collection.Collection.load(self.file)
+        if self.collection is None:
+            writer.stderr.status(self.file, "BADFILE")
+            return False
 
         # Set root
         if self.options.root:
@@ -197,8 +205,59 @@ class Program(object):
 
         return True
 
+    def save_file(self):
+        """ Save the collection to the file. """
+        # Write to a temporary file first so the data file is only
+        # replaced once the new one is complete
+        dirname = os.path.dirname(os.path.abspath(self.file))
+        (fd, temppath) = tempfile.mkstemp(
+            prefix=os.path.basename(self.file) + ".",
+            suffix=".tmp",
+            dir=dirname
+        )
+        os.close(fd)
+
+        try:
+            self.collection.save(temppath)
+            self._copy_owner(self.file, temppath)
+            self.save_backup()
+            os.replace(temppath, self.file)
+        except BaseException:
+            os.remove(temppath)
+            raise
+
+        # Make the rename itself durable.  Directories can only be opened
+        # this way on POSIX systems.
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    @staticmethod
+    def _copy_owner(source, dest):
+        """ Give the new file the mode and ownership of the file it replaces. """
+        try:
+            info = os.stat(source)
+        except FileNotFoundError:
+            # mkstemp only allows the owner access, use the usual default
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(dest, 0o666 & ~umask)
+            return
+
+        shutil.copymode(source, dest)
+        if hasattr(os, "chown"):
+            try:
+                os.chown(dest, info.st_uid, info.st_gid)
+            except PermissionError:
+                pass # Only allowed for root or to the user's own groups
+
     def save_backup(self):
-        """ Save a backup based on the filename if requested. """
+        """ Save a backup based on the filename if requested.  The current
+            file is linked or copied to the backup so it stays in place until
+            the new file replaces it. """
         filename = self.file
         backupname = os.path.join(
             self.collection.exportdir,
@@ -226,7 +285,11 @@ class Program(object):
                         backupname + backup_concat[i + 1]
                     )
 
-            os.rename(filename, backupname + backup_concat[0])
+            try:
+                os.link(filename, backupname + backup_concat[0])
+            except OSError:
+                # Another filesystem or no hard link support
+                shutil.copy2(filename, backupname + backup_concat[0])
 
 
     def find_file(self):
@@ -258,4 +321,11 @@ class Program(object):
 
 
 def main():
-    sys.exit(Program().main())
+    program = Program()
+    try:
+        result = program.main()
+    finally:
+        if program.writer is not None:
+            program.writer.flush()
+
+    sys.exit(result)
@@ -11,7 +11,9 @@ __all__ = [
 
 
 import io
+import re
 import sys
+import time
 
 from . import collection
 
@@ -19,16 +21,13 @@ from . import collection
 # Time difference to consider a file's timestamp changed
 TIMEDIFF = 2
 
+# Separators used by splitval
+_SPLITVAL_RE = re.compile("[, \t\n\r]+")
+
 
 def splitval(val):
     """ Split a string into a list of non-empty values by comma or whitespace. """
-    # Convert whitespace to comma
-    tmpval = ''.join(
-        "," if ch in " \t\n\r" else ch for ch in val
-    )
-    return list(
-        word for word in tmpval.split(",") if len(word)
-    )
+    return [word for word in _SPLITVAL_RE.split(val) if word]
 
 
 class StreamWriter(object):
@@ -46,11 +45,26 @@ class StreamWriter(object):
         def __exit__(self, type, value, traceback):
             self._writer.dedent()
 
-    def __init__(self, stream, indent="    "):
-        """ Initialze the writer. """
+    # Number of lines buffered before writing to a non-interactive stream
+    BUFFER_LINES = 256
+
+    # Seconds after which buffered lines are written once an item's output is
+    # complete, so a log being followed doesn't fall far behind
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, stream, indent="    ", buffered=True, linked=None):
+        """ Initialze the writer.  If linked is another writer, it is flushed
+            before this writer writes so the order between them is kept. """
         self._stream = stream
         self._indent_level = 0
         self._indent_text = indent
+        self._buffer = []
+        self._linked = linked
+        self._last_flush = time.monotonic()
+
+        # Interactive streams are written to after every line
+        isatty = getattr(stream, "isatty", None)
+        self._tty = bool(isatty and isatty()) or not buffered
 
     def indent(self):
         """ Increase the indent. """
@@ -60,20 +74,37 @@ class StreamWriter(object):
     def dedent(self):
         """ Decrease the indent. """
         self._indent_level -= 1
+        if self._indent_level == 0:
+            self.flush_if_due()
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
+        self.flush()
         self._stream.close()
         self._stream = None
 
     def writeln(self, line):
         """ Write a line of text to the stream. """
-        self._stream.write(self._indent_level * self._indent_text)
-        self._stream.write(line)
-        self._stream.write("\n")
+        self._buffer.append(self._indent_level * self._indent_text + line + "\n")
+        if self._tty or len(self._buffer) >= self.BUFFER_LINES:
+            self.flush()
+
+    def flush(self):
+        """ Write any buffered lines to the stream. """
+        if self._buffer:
+            if self._linked is not None:
+                self._linked.flush()
+            self._stream.write("".join(self._buffer))
+            self._buffer = []
         self._stream.flush()
+        self._last_flush = time.monotonic()
+
+    def flush_if_due(self):
+        """ Flush any buffered lines if the flush interval has passed. """
+        if self._buffer and time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL:
+            self.flush()
 
 
 class LogWriter(StreamWriter):
@@ -83,6 +114,11 @@ class LogWriter(StreamWriter):
         """ Initialize the writer. """
         StreamWriter.__init__(self, *args, **kwargs)
         self._last = None
+        self._flush_next = False
+
+    def flush_next(self):
+        """ Flush the stream after the next status is written. """
+        self._flush_next = True
 
     def status(self, path, status, msg=None):
         """ Show the status with optional message.
@@ -91,6 +127,7 @@ class LogWriter(StreamWriter):
         """
         check = (path, status)
         if check != self._last:
+            self.flush_if_due()
             self._last = check
             if isinstance(path, (list, tuple)):
                 path = "/" + "/".join(path)
@@ -104,6 +141,10 @@ class LogWriter(StreamWriter):
             with self.indent():
                 self.writeln("> " + msg)
 
+        if self._flush_next:
+            self._flush_next = False
+            self.flush()
+
 
     def statusline(self, path, status, msg):
         """ Write a status line for a given path/status pair.
@@ -122,6 +163,9 @@ class LogWriter(StreamWriter):
 class TextFile(StreamWriter):
     """ A text file based on StreamWriter. """
 
+    # Files are not watched as they are written, so fewer larger writes
+    BUFFER_LINES = 4096
+
     def __init__(self, filename):
         """ Initialize the text file. """
         stream = io.open(filename, "wt", encoding="utf-8", newline="\n")
@@ -134,4 +178,11 @@ class StdStreamWriter(object):
     def __init__(self):
         """ Initialize teh writer. """
         self.stdout = LogWriter(sys.stdout)
-        self.stderr = LogWriter(sys.stderr)
+        # Errors are written right away, after any pending normal output, so
+        # they appear in order when both streams go to the same place
+        self.stderr = LogWriter(sys.stderr, buffered=False, linked=self.stdout)
+
+    def flush(self):
+        """ Write any buffered output to the streams. """
+        self.stdout.flush()
+        self.stderr.flush()
@@ -13,7 +13,10 @@ setup(
     url='',
     author=metadata["__author__"],
     license='MIT',
-    packages=find_namespace_packages(),
+    packages=find_namespace_packages(include=["mrbavii.*"]),
+    extras_require={
+        'lxml': ['lxml']
+    },
     entry_points={
         'console_scripts': [
             'mrbavii-fcman = mrbavii.fcman.main:main'
@@ -0,0 +1,79 @@
+""" Tests for the batch action. """
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from mrbavii.fcman import collection
+from mrbavii.fcman import main
+
+
+class BatchTest(unittest.TestCase):
+    """ Test running actions from a batch file. """
+
+    def setUp(self):
+        self.iwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        self.filename = os.path.join(self.root, "fcman.xml")
+        self.batchfile = os.path.join(self.root, "batch.txt")
+
+        self._write("a", "data")
+        self.assertEqual(self._run("init"), 0)
+        self.assertEqual(self._run("update"), 0)
+
+    def tearDown(self):
+        os.chdir(self.iwd)
+        shutil.rmtree(self.root)
+
+    def _write(self, name, data):
+        with open(os.path.join(self.root, name), "wt") as handle:
+            handle.write(data)
+
+    def _run(self, *args):
+        argv = ["fcman", "-C", self.root] + list(args)
+        with mock.patch.object(sys, "argv", argv):
+            program = main.Program()
+            try:
+                return program.main()
+            finally:
+                program.writer.flush()
+                os.chdir(self.iwd)
+
+    def _names(self):
+        return collection.Collection.load(self.filename).rootnode.sorted_names()
+
+    def test_failure_saves_earlier_changes(self):
+        # Verify fails on the changed file after b was added
+        self._write("a", "changed")
+        self._write("b", "data")
+        self._write("batch.txt", "add b\nverify\nadd batch.txt\n")
+
+        with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+            self.assertEqual(self._run("batch", self.batchfile), -1)
+
+        self.assertEqual(self._names(), ["a", "b", "fcman.xml"])
+
+    def test_help_continues(self):
+        self._write("b", "data")
+        self._write("batch.txt", "add --help\nadd b\n")
+
+        with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+            self.assertEqual(self._run("batch", self.batchfile), 0)
+
+        self.assertEqual(self._names(), ["a", "b", "fcman.xml"])
+
+    def test_bad_line_stops(self):
+        self._write("b", "data")
+        self._write("batch.txt", "add --bad b\nadd b\n")
+
+        with mock.patch("sys.stdout"), mock.patch("sys.stderr"):
+            self.assertEqual(self._run("batch", self.batchfile), -1)
+
+        self.assertEqual(self._names(), ["a", "fcman.xml"])
+
+
+if __name__ == "__main__":
+    unittest.main()
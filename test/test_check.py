@@ -0,0 +1,90 @@
+""" Tests for the check and verify actions. """
+
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from mrbavii.fcman import collection
+from mrbavii.fcman import util
+from mrbavii.fcman.actions.action_check import VerifyAction
+
+
+class _Program(object):
+    """ The parts of the program used by the actions. """
+
+    def __init__(self, coll, options):
+        self.collection = coll
+        self.options = options
+        self.writer = util.StdStreamWriter()
+        self.verbose = False
+        self.iwd = coll.root
+
+
+class VerifyCancelTest(unittest.TestCase):
+    """ Test interrupting a parallel verify. """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.coll = collection.Collection()
+        self.coll.set_root(self.root)
+
+        for i in range(8):
+            path = os.path.join(self.root, "file{0}".format(i))
+            with open(path, "wb") as handle:
+                handle.write(b"data")
+            stat = os.stat(path)
+            collection.File(
+                self.coll.rootnode, "file{0}".format(i),
+                stat.st_size, int(stat.st_mtime), "checksum"
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_interrupt_drops_queued_checksums(self):
+        options = argparse.Namespace(
+            path="/", state=None, autosave=1000000, jobs=2, recurse=True,
+            direct=False
+        )
+        running = threading.Semaphore(0)
+        release = threading.Event()
+        queued = []
+
+        def calc_checksum(node, direct=False):
+            # pylint: disable=unused-argument
+            running.release()
+            release.wait(10)
+            return "checksum"
+
+        class InterruptedVerify(VerifyAction):
+            def _queue_checksums(self, items):
+                VerifyAction._queue_checksums(self, items)
+                queued.extend(self._checksums.values())
+
+            def handle_file(self, node, entry=None):
+                # Interrupt once both jobs are busy with a checksum
+                for _ in range(2):
+                    running.acquire(timeout=10)
+                raise KeyboardInterrupt
+
+        action = InterruptedVerify(_Program(self.coll, options))
+        try:
+            with mock.patch.object(collection.File, "calc_checksum", calc_checksum):
+                with self.assertRaises(KeyboardInterrupt):
+                    action.run()
+
+                # Only the checksums already running are left, the rest
+                # were dropped without waiting for them
+                self.assertEqual(len(queued), 8)
+                self.assertEqual(sum(1 for i in queued if i.cancelled()), 6)
+                self.assertIsNone(action._executor) # pylint: disable=protected-access
+        finally:
+            release.set()
+
+
+if __name__ == "__main__":
+    unittest.main()
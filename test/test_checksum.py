@@ -0,0 +1,98 @@
+""" Tests for the collection checksum algorithms. """
+
+import hashlib
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from mrbavii.fcman import collection
+from mrbavii.fcman import main
+
+
+class ChecksumTest(unittest.TestCase):
+    """ Test collections using different checksum algorithms. """
+
+    def setUp(self):
+        self.iwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        self.filename = os.path.join(self.root, "fcman.xml")
+
+        with open(os.path.join(self.root, "a"), "wb") as handle:
+            handle.write(b"data")
+
+    def tearDown(self):
+        os.chdir(self.iwd)
+        shutil.rmtree(self.root)
+
+    def _run(self, *args):
+        """ Run fcman in the collection, returning the result and stderr. """
+        argv = ["fcman", "-C", self.root] + list(args)
+        stderr = io.StringIO()
+        with mock.patch.object(sys, "argv", argv), \
+                mock.patch("sys.stdout", io.StringIO()), \
+                mock.patch("sys.stderr", stderr):
+            program = main.Program()
+            try:
+                result = program.main()
+            finally:
+                if program.writer is not None:
+                    program.writer.flush()
+                os.chdir(self.iwd)
+
+        return (result, stderr.getvalue())
+
+    def test_save_load(self):
+        for checksum in ("sha256", "blake2b"):
+            coll = collection.Collection()
+            coll.set_root(self.root)
+            coll.checksum = checksum
+            node = collection.File(coll.rootnode, "a", 4, 0, "")
+            node.checksum = node.calc_checksum()
+            coll.save(self.filename)
+
+            coll = collection.Collection.load(self.filename)
+            self.assertEqual(coll.checksum, checksum)
+            self.assertEqual(
+                coll.rootnode.children["a"].checksum,
+                hashlib.new(checksum, b"data").hexdigest()
+            )
+
+    def test_unknown_checksum(self):
+        with open(self.filename, "wt") as handle:
+            handle.write(
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<collection root="." checksum="crc32" />\n'
+            )
+
+        self.assertIsNone(collection.Collection.load(self.filename))
+
+        (result, stderr) = self._run("check")
+        self.assertEqual(result, -1)
+        self.assertIn("BADFILE", stderr)
+
+    def test_init_choices(self):
+        with mock.patch("sys.stderr", io.StringIO()):
+            with self.assertRaises(SystemExit):
+                self._run("init", "-c", "crc32")
+        self.assertFalse(os.path.exists(self.filename))
+
+        self.assertEqual(self._run("init", "-c", "sha256")[0], 0)
+        self.assertEqual(collection.Collection.load(self.filename).checksum, "sha256")
+
+    def test_export_sums_file(self):
+        self.assertEqual(self._run("init", "-c", "blake2b")[0], 0)
+        self.assertEqual(self._run("update")[0], 0)
+        self._run("export")
+
+        self.assertFalse(os.path.exists(os.path.join(self.root, "md5sums.txt")))
+        with open(os.path.join(self.root, "b2sums.txt"), "rt") as handle:
+            sums = handle.read()
+        self.assertIn(hashlib.blake2b(b"data").hexdigest() + " *a\n", sums)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+""" Tests for the collection. """
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from mrbavii.fcman import collection
+
+
+class DuplicateChildTest(unittest.TestCase):
+    """ Test a collection with two children of the same name. """
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, "fcman.xml")
+        with open(self.filename, "wt") as handle:
+            handle.write(
+                '<?xml version="1.0" encoding="utf-8"?>\n'
+                '<collection root=".">\n'
+                '  <file name="a" size="1" timestamp="1" checksum="x" />\n'
+                '  <file name="a" size="2" timestamp="2" checksum="y" />\n'
+                '  <file name="b" size="3" timestamp="3" checksum="z" />\n'
+                '</collection>\n'
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_replace_existing_name(self):
+        coll = collection.Collection.load(self.filename)
+        rootnode = coll.rootnode
+
+        # The later element replaces the earlier one
+        self.assertEqual(rootnode.sorted_names(), ["a", "b"])
+        self.assertEqual(rootnode.children["a"].size, 2)
+        self.assertEqual([i.name for i in rootnode.walk()], [None, "a", "b"])
+
+        rootnode.remove_child("a")
+        self.assertEqual(rootnode.sorted_names(), ["b"])
+        self.assertEqual([i.name for i in rootnode.walk()], [None, "b"])
+
+        coll.save(self.filename)
+        coll = collection.Collection.load(self.filename)
+        self.assertEqual(coll.rootnode.sorted_names(), ["b"])
+
+
+if __name__ == "__main__":
+    unittest.main()